@@ -1,17 +1,49 @@
 import argparse
+import calendar
+import functools
 import os
-import time
+import queue
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import configparser
 from retrying import retry
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+log = logging.getLogger(__name__)
 config_file_path = 'settings.ini'
+chrome_profile_dir = os.path.expanduser('~/.nytreset-chrome')
+
+# Shared HTTP session so retries and repeated calls reuse pooled keep-alive connections.
+# Transient failures are retried inside the connection pool with exponential backoff.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(
+    total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504), allowed_methods={"GET", "POST"})))
+_SESSION.headers.update({"User-Agent": "Crosswords/20191213190708 CFNetwork/1128.0.1 Darwin/19.6.0", "client_id": "ios.crosswords"})
+
+MONTH_TABS = 4
+DEFAULT_WORKERS = 4
+
+# This read-only lookup is not documented by NYT. It expects a user-id path segment; this is
+# the one public clients of it send.
+PUZZLES_API_URL = "https://www.nytimes.com/svc/crosswords/v3/36569100/puzzles.json"
+
+CALENDAR = (By.CSS_SELECTOR, ".calendar")
+PUZZLE_INFO = (By.CSS_SELECTOR, ".puzzleInfo")
+PUZZLE_LINKS = (By.CSS_SELECTOR, 'a[href*="/crosswords/game/mini/"]')
+PLAY_BUTTON = (By.XPATH, "//button[@aria-label='Play']")
+RESET_BUTTON = (By.XPATH, "//button[@aria-label='Reset']")
+# Collects every Review link's href in one WebDriver round-trip instead of one per element.
+REVIEW_HREFS_SCRIPT = (
+    "return Array.from(document.querySelectorAll(arguments[0]))"
+    ".filter(a => a.innerText.includes('Review')).map(a => a.href);"
+)
 
 
 def load_or_prompt_settings():
@@ -34,12 +66,10 @@ def load_or_prompt_settings():
 def retry_if_exception(exception):
     return isinstance(exception, Exception)
 
-@retry(retry_on_exception=retry_if_exception, stop_max_attempt_number=3, wait_fixed=2000)
 def get_auth_cookie(username, password):
-    login_resp = requests.post(
+    login_resp = _SESSION.post(
         "https://myaccount.nytimes.com/svc/ios/v2/login",
         data={"login": username, "password": password},
-        headers={"User-Agent": "Crosswords/20191213190708 CFNetwork/1128.0.1 Darwin/19.6.0", "client_id": "ios.crosswords"},
     )
     login_resp.raise_for_status()
     for cookie in login_resp.json()["data"]["cookies"]:
@@ -47,97 +77,226 @@ def get_auth_cookie(username, password):
             return {"name": "NYT-S", "value": cookie["cipheredValue"], "domain": ".nytimes.com"}
     raise RuntimeError("Could not get authentication cookie from login.")
 
-def init_browser(headless=True, cookie_value=None):
-    print("Initializing the browser...")
+def init_browser(headless=True, cookie_value=None, profile_dir=chrome_profile_dir):
+    log.info("Initializing the browser...")
     options = webdriver.ChromeOptions()
     if headless:
         options.add_argument('--headless')
+    # A persistent profile keeps the HTTP cache and cookie jar between runs.
+    options.add_argument(f'--user-data-dir={profile_dir}')
+    options.add_argument('--disk-cache-size=104857600')
+    # Only the DOM is inspected, so skip downloading images.
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    # Return from driver.get once the DOM is ready; the explicit waits cover the rest.
+    options.page_load_strategy = 'eager'
     browser = webdriver.Chrome(options=options)
-    browser.get("https://www.nytimes.com/crosswords/archive")
+    # Waits are created once per browser and reused at every call site.
+    browser.wait2 = WebDriverWait(browser, 2)
+    browser.wait3 = WebDriverWait(browser, 3)
+    browser.wait5 = WebDriverWait(browser, 5)
+    browser.wait10 = WebDriverWait(browser, 10)
+    browser.wait30 = WebDriverWait(browser, 30)
     if cookie_value:
-        print("Adding provided cookie to browser session...")
-        browser.add_cookie({'name': "NYT-S", 'value': cookie_value, 'domain': '.nytimes.com'})
+        # CDP can set a cookie for any domain, so there is no need to load an NYT page first.
+        log.debug("Adding provided cookie to browser session...")
+        browser.execute_cdp_cmd("Network.setCookie", {
+            "name": "NYT-S", "value": cookie_value, "domain": ".nytimes.com", "path": "/", "secure": True})
     return browser
 
-def save_date_to_text(date, text_file_path):
-    print(f"Saving date {date} to text file...")
+def save_date_to_text(date, file, seen_dates):
     formatted_date = date.replace('-', '/')
-    with open(text_file_path, 'a') as file:
-        file.write(formatted_date + '\n')
+    if formatted_date in seen_dates:
+        return
+    seen_dates.add(formatted_date)
+    log.debug("Saving date %s to text file...", date)
+    file.write(formatted_date + '\n')
+
+def get_months(start_date, end_date):
+    start_month, start_year = (int(part) for part in start_date.split("/"))
+    end_month, end_year = (int(part) for part in end_date.split("/"))
+    months = []
+    year, month = start_year, start_month
+    while (year, month) <= (end_year, end_month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+def find_incomplete_puzzles_via_api(text_file_path, start_date, end_date):
+    # Returns False if the API could not be used, so the caller can fall back to the browser.
+    # This selects puzzles that are started but not solved, whereas the browser scan selects the
+    # archive cards labelled Review, so the two scans can disagree at the edges.
+    if not _SESSION.cookies.get("NYT-S"):
+        log.warning("No NYT-S cookie available, so the API cannot report puzzle progress.")
+        return False
+    seen_dates = set()
+    try:
+        with open(text_file_path, 'w') as file:
+            for year, month in get_months(start_date, end_date):
+                log.info('Searching for incomplete puzzles for %s/%s through the NYT API...', year, month)
+                resp = _SESSION.get(PUZZLES_API_URL, params={
+                    "publish_type": "mini",
+                    "date_start": f"{year}-{month:02d}-01",
+                    "date_end": f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}",
+                })
+                resp.raise_for_status()
+                results = resp.json().get("results") or []
+                # Without a valid login the results carry no progress, which would look like an empty scan.
+                if any("percent_filled" not in puzzle or "solved" not in puzzle for puzzle in results):
+                    log.warning("The API returned no puzzle progress; is the NYT-S cookie still valid?")
+                    return False
+                for puzzle in results:
+                    if puzzle["percent_filled"] and not puzzle["solved"]:
+                        save_date_to_text(puzzle["print_date"], file, seen_dates)
+    except Exception as e:
+        log.error("Error while gathering incomplete puzzles through the API: %s", e)
+        return False
+    return True
+
+def document_ready(driver):
+    # A fresh tab starts on about:blank, which is already "complete", so it must have navigated
+    # away first. After that this matches what the eager page load strategy waits for.
+    return driver.execute_script(
+        "return location.href !== 'about:blank' && document.readyState !== 'loading';")
+
+def open_tab(driver, url):
+    # window.open returns immediately, so the page keeps loading while other tabs are opened.
+    known_tabs = set(driver.window_handles)
+    driver.execute_script("window.open(arguments[0]);", url)
+    driver.wait5.until(EC.number_of_windows_to_be(len(known_tabs) + 1))
+    return next(tab for tab in driver.window_handles if tab not in known_tabs)
 
 @retry(retry_on_exception=retry_if_exception, stop_max_attempt_number=3, wait_fixed=2000)
 def find_incomplete_puzzles(driver, text_file_path, start_date, end_date):
-    # Clear the file first before writing dates to it. 
-    with open(text_file_path, 'r+') as file:
-        file.truncate(0)
-    month_urls_to_check = []
-    start_month, year = start_date.split("/")
-    start_month = int(start_month)
-    end_month = int(end_date.split("/")[0])
-
-    for i in range(end_month - start_month + 1):
-        month = start_month + i
-        month_urls_to_check.append(f"{year}/{month}")
-
-    driver.get("https://www.nytimes.com/crosswords/archive/mini")
-    WebDriverWait(driver, 5).until(
-        EC.visibility_of_element_located((By.CSS_SELECTOR, ".calendar")))
-    back_button_selector = ".archive_prev"
-    for month_url in month_urls_to_check:
-        try:
-            print(f'Searching for completed puzzles for {month_url}...')
-            driver.get(f"https://www.nytimes.com/crosswords/archive/mini/{month_url}")
-            WebDriverWait(driver, 5).until(
-                EC.visibility_of_element_located((By.CSS_SELECTOR, ".calendar")))
-            WebDriverWait(driver, 2).until(
-                EC.visibility_of_all_elements_located((By.CSS_SELECTOR, ".puzzleInfo")))
-            WebDriverWait(driver, 3).until(EC.visibility_of_element_located((By.XPATH, "//a[.//span[text()='Review']]")))
-            incomplete_puzzles = driver.find_elements(By.XPATH, "//a[.//span[text()='Review']]")
-            for puzzle in incomplete_puzzles:
-                href = puzzle.get_attribute("href")
-                puzzle_date = "-".join(href.split("/")[-3:])
-                save_date_to_text(puzzle_date, text_file_path)
-        except Exception as e:
-            print(f"Error while gathering incomplete puzzles: {e}")
-            break
+    # The file starts out empty, so the dates written during this scan are all we need to track.
+    seen_dates = set()
+    month_urls_to_check = [f"{year}/{month}" for year, month in get_months(start_date, end_date)]
+    main_window = driver.current_window_handle
+
+    # Opening with 'w' clears the file, and the handle stays open for the whole scan.
+    with open(text_file_path, 'w') as file:
+        for i in range(0, len(month_urls_to_check), MONTH_TABS):
+            month_tabs = []
+            try:
+                # Open a batch of months in tabs up front so their pages load in parallel.
+                for month_url in month_urls_to_check[i:i + MONTH_TABS]:
+                    month_tabs.append((month_url, open_tab(driver, f"https://www.nytimes.com/crosswords/archive/mini/{month_url}")))
+                for month_url, tab in month_tabs:
+                    log.info('Searching for completed puzzles for %s...', month_url)
+                    driver.switch_to.window(tab)
+                    # window.open does not block like driver.get, so wait for the page itself first.
+                    driver.wait30.until(document_ready)
+                    driver.wait5.until(EC.visibility_of_element_located(CALENDAR))
+                    driver.wait2.until(EC.visibility_of_all_elements_located(PUZZLE_INFO))
+                    driver.wait3.until(EC.visibility_of_element_located(PUZZLE_LINKS))
+                    hrefs = driver.execute_script(REVIEW_HREFS_SCRIPT, PUZZLE_LINKS[1])
+                    for href in hrefs:
+                        _, year, month, day = href.rsplit("/", 3)
+                        save_date_to_text(f"{year}-{month}-{day}", file, seen_dates)
+            except Exception as e:
+                log.error("Error while gathering incomplete puzzles: %s", e)
+                break
+            finally:
+                # Close every tab but the main one, including any opened before its handle was picked up.
+                for tab in driver.window_handles:
+                    if tab != main_window:
+                        driver.switch_to.window(tab)
+                        driver.close()
+                driver.switch_to.window(main_window)
 
 @retry(retry_on_exception=retry_if_exception, stop_max_attempt_number=3, wait_fixed=2000)
 def clear_puzzle_for_date(driver, date):
-    print(f"Clearing puzzle for date: {date}...")
+    log.info("Clearing puzzle for date: %s...", date)
     puzzle_url = f"https://www.nytimes.com/crosswords/game/mini/{date}"
     driver.get(puzzle_url)
-    WebDriverWait(driver, 10).until(
-        EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='Play']"))).click()
-    WebDriverWait(driver, 10).until(
-        EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='Reset']"))).click()
-    print("Puzzle cleared.")
+    driver.wait10.until(EC.element_to_be_clickable(PLAY_BUTTON)).click()
+    driver.wait10.until(EC.element_to_be_clickable(RESET_BUTTON)).click()
+    log.debug("Puzzle cleared.")
+
+def get_puzzles(dates):
+    # One lookup per month instead of one per date.
+    dates_by_month = {}
+    for date in dates:
+        dates_by_month.setdefault(date[:7], []).append(date)
+    puzzles = {}
+    for month_dates in dates_by_month.values():
+        resp = _SESSION.get(PUZZLES_API_URL, params={
+            "publish_type": "mini",
+            "date_start": min(month_dates).replace('/', '-'),
+            "date_end": max(month_dates).replace('/', '-'),
+        })
+        resp.raise_for_status()
+        for puzzle in resp.json().get("results") or []:
+            puzzles[puzzle["print_date"].replace('-', '/')] = puzzle
+    return puzzles
 
-def clear_puzzles_from_text(driver, text_file_path):
+def clear_puzzles_from_text(get_driver, text_file_path, headless=True, cookie_value=None, workers=DEFAULT_WORKERS):
     if not os.path.exists(text_file_path):
-        print("Text file does not exist.")
+        log.warning("Text file does not exist.")
         return
-    print("Clearing puzzles from text file...")
+    log.info("Clearing puzzles from text file...")
     with open(text_file_path, 'r') as file:
         dates = file.read().splitlines()
-    for date in dates:
+    # Progress is only reported for a logged-in session. Skip a date only when its progress is
+    # explicitly 0; a missing record or value still gets cleared.
+    if _SESSION.cookies.get("NYT-S"):
+        try:
+            puzzles = get_puzzles(dates)
+        except Exception as e:
+            log.error("Error looking up puzzles: %s", e)
+            puzzles = {}
+        dates = [date for date in dates if puzzles.get(date, {}).get("percent_filled") != 0]
+    if not dates:
+        return
+    log.info("Clearing %d puzzle(s) through the browser...", len(dates))
+
+    # Each worker checks a browser out of the pool, so no two threads ever share a driver.
+    idle_drivers = queue.Queue()
+    extra_drivers = []
+
+    def clear(date):
+        pooled_driver = idle_drivers.get()
         try:
-            clear_puzzle_for_date(driver, date)
+            clear_puzzle_for_date(pooled_driver, date)
         except Exception as e:
-            print(f"Error clearing puzzle for {date}: {e}")
+            log.error("Error clearing puzzle for %s: %s", date, e)
+        finally:
+            idle_drivers.put(pooled_driver)
 
+    try:
+        idle_drivers.put(get_driver())
+        # Chrome locks its profile directory, so every extra browser gets a profile of its own.
+        for i in range(1, min(workers, len(dates))):
+            extra_drivers.append(init_browser(headless, cookie_value, f"{chrome_profile_dir}-{i}"))
+            idle_drivers.put(extra_drivers[-1])
+        with ThreadPoolExecutor(max_workers=len(extra_drivers) + 1) as executor:
+            list(executor.map(clear, dates))
+    finally:
+        for extra_driver in extra_drivers:
+            extra_driver.quit()
 
-def main(cookie_value, headless, start_date, end_date, mode):
-    print("Script started. Preparing to clear NYT Crossword puzzles...")
+
+def main(cookie_value, headless, start_date, end_date, mode, workers=DEFAULT_WORKERS, use_api=False):
+    log.info("Script started. Preparing to clear NYT Crossword puzzles...")
     text_file_path = "incomplete_puzzles.txt"
-    driver = init_browser(headless, cookie_value)
+    if cookie_value:
+        _SESSION.cookies.set("NYT-S", cookie_value, domain=".nytimes.com")
 
-    if mode in ["scan", "both"]:
-        find_incomplete_puzzles(driver, text_file_path, start_date, end_date)
-    if mode in ["fix", "both"]:
-        clear_puzzles_from_text(driver, text_file_path)
+    # Chrome is only started once something actually needs it, and is then shared by scan and fix.
+    @functools.cache
+    def get_driver():
+        return init_browser(headless, cookie_value)
 
-    print("Operation completed.")
-    driver.quit()
+    try:
+        if mode in ["scan", "both"]:
+            if not use_api or not find_incomplete_puzzles_via_api(text_file_path, start_date, end_date):
+                find_incomplete_puzzles(get_driver(), text_file_path, start_date, end_date)
+        if mode in ["fix", "both"]:
+            clear_puzzles_from_text(get_driver, text_file_path, headless, cookie_value, workers)
+        log.info("Operation completed.")
+    finally:
+        if get_driver.cache_info().currsize:
+            get_driver().quit()
 
 
 if __name__ == "__main__":
@@ -145,11 +304,20 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="NYTimes Crossword Puzzle Automation")
     parser.add_argument('--headless', nargs='?', const=True, default=None, help="Run browser in headless mode (yes/no).")
-    parser.add_argument('--start_date', type=str, default=None, help="Start date. Format must be MM/YYYY. The end and start date have to be in the same year.")
-    parser.add_argument('--end_date', type=str, default=None, help="End date. Format must be MM/YYYY. The end and start date have to be in the same year.")
+    parser.add_argument('--start_date', type=str, default=None, help="Start date. Format must be MM/YYYY.")
+    parser.add_argument('--end_date', type=str, default=None, help="End date. Format must be MM/YYYY.")
     parser.add_argument('--mode', choices=['scan', 'fix', 'both'], default=None, help="Operation mode: scan for incomplete puzzles, fix incomplete puzzles, or both.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Number of browser sessions used in parallel when fixing puzzles.")
+    parser.add_argument('--quiet', action='store_true', help="Only log warnings and errors.")
+    parser.add_argument('--verbose', action='store_true', help="Also log per-date debug messages.")
+    parser.add_argument('--api', action='store_true', help="Scan through the undocumented NYT API before falling back to the browser.")
     args = parser.parse_args()
 
+    if args.quiet:
+        logging.getLogger().setLevel(logging.WARNING)
+    elif args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
     # Prompt for headless if not provided
     if args.headless is None:
         headless_input = input("Run in headless mode? (y/n): ").strip().lower()
@@ -169,4 +337,4 @@ if __name__ == "__main__":
         auth_cookie = get_auth_cookie(username, password)
         cookie_value = auth_cookie['value']
 
-    main(cookie_value, args.headless, args.start_date, args.end_date, args.mode)
\ No newline at end of file
+    main(cookie_value, args.headless, args.start_date, args.end_date, args.mode, max(1, args.workers), args.api)
\ No newline at end of file